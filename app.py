@@ -1,8 +1,12 @@
 import streamlit as st
-import os
-import tempfile
+import pandas as pd
+import hashlib
+import requests
+import re
+import threading
+import time
+from typing import List, Optional, Tuple
 from langchain_ollama import OllamaLLM
-from langchain.chains import RetrievalQA
 from langchain.prompts import PromptTemplate
 
 from document_processor import DocumentProcessor
@@ -10,9 +14,93 @@ from vector_store import VectorStore
 
 import config
 
+@st.cache_resource(ttl=30)
+def _check_ollama(base_url: str, model: str) -> bool:
+    """Check that Ollama is reachable and the model has been pulled."""
+    try:
+        response = requests.get(f"{base_url}/api/tags", timeout=1)
+        response.raise_for_status()
+        names = {m.get("name") for m in response.json().get("models", [])}
+    except (requests.RequestException, ValueError):
+        return False
+    return model in names or f"{model}:latest" in names
+
+@st.cache_resource
+def _get_llm(base_url: str, model: str) -> OllamaLLM:
+    """Create the LLM client once per (base_url, model)."""
+    return OllamaLLM(base_url=base_url, model=model, temperature=0.1)
+
+@st.cache_resource
+def _get_doc_processor() -> DocumentProcessor:
+    """Share a single DocumentProcessor across reruns."""
+    return DocumentProcessor()
+
+_PROMPT_TEMPLATES = {
+    prompt_type: PromptTemplate(template=template, input_variables=["context", "question"])
+    for prompt_type, template in config.RESUME_PROMPTS.items()
+}
+
+def get_prompt_template(prompt_type: str):
+    """Get prompt template based on analysis type."""
+    return _PROMPT_TEMPLATES.get(prompt_type, _PROMPT_TEMPLATES["general"])
+
+@st.cache_resource(max_entries=64)
+def _get_retriever(_vector_store, k: int = 5, file_shas: Tuple[str, ...] = ()):
+    """Build the retriever once per (k, file_shas), searching only those files."""
+    filter_metadata = {"file_sha": {"$in": list(file_shas)}} if file_shas else None
+    return _vector_store.get_retriever(k=k, filter_metadata=filter_metadata)
+
+@st.cache_resource
+def _get_answer_cache():
+    """Process-wide store of finished answers, shared across sessions."""
+    return {}, threading.Lock()
+
+def _lookup_answer(key):
+    """Return a cached answer if it exists and has not expired."""
+    cache, lock = _get_answer_cache()
+    with lock:
+        entry = cache.get(key)
+        if entry is None:
+            return None
+        stored_at, answer = entry
+        if time.time() - stored_at > config.ANSWER_CACHE_TTL:
+            del cache[key]
+            return None
+        return answer
+
+def _store_answer(key, answer):
+    """Cache an answer, evicting the oldest entries beyond the size limit."""
+    cache, lock = _get_answer_cache()
+    with lock:
+        cache.pop(key, None)
+        cache[key] = (time.time(), answer)
+        while len(cache) > config.ANSWER_CACHE_MAX_ENTRIES:
+            del cache[next(iter(cache))]
+
+def _match_resume(question: str, resumes: List[str]) -> Optional[str]:
+    """Return the one loaded resume the question mentions by name, if any."""
+    question = question.lower()
+    # Only full file names count; stems like "resume" or "cv" also appear in ordinary questions
+    matches = {
+        name for name in resumes
+        if re.search(rf"(?<!\w){re.escape(name.lower())}(?!\w)", question)
+    }
+    return matches.pop() if len(matches) == 1 else None
+
+def _render_sources(sources):
+    """Show source snippets as one virtualized table instead of a widget per source."""
+    with st.expander("📄 Resume Sources"):
+        st.dataframe(pd.DataFrame(sources), hide_index=True, width="stretch")
+
+def _stream_answer(llm, source_documents, question: str, prompt_type: str):
+    """Yield LLM tokens for the question, stuffing the sources into the prompt."""
+    context = "\n\n".join(doc.page_content for doc in source_documents)
+    prompt = get_prompt_template(prompt_type).format(context=context, question=question)
+    yield from llm.stream(prompt)
+
 class ResumeAnalyzer:
     def __init__(self):
-        self.document_processor = DocumentProcessor()
+        self.document_processor = _get_doc_processor()
         
         # Initialize session state
         if 'vector_store' not in st.session_state:
@@ -21,164 +109,210 @@ class ResumeAnalyzer:
             st.session_state.messages = []
         if 'resumes_processed' not in st.session_state:
             st.session_state.resumes_processed = []
+        if 'resume_shas' not in st.session_state:
+            st.session_state.resume_shas = {}  # filename -> file_sha
         if 'current_prompt_type' not in st.session_state:
             st.session_state.current_prompt_type = "general"
         
         self.vector_store = st.session_state.vector_store
         
         # Initialize LLM
-        self.llm = OllamaLLM(
-            base_url=config.OLLAMA_BASE_URL,
-            model=config.DEFAULT_MODEL,
-            temperature=0.1
-        )
-    
-    def get_prompt_template(self, prompt_type: str):
-        """Get prompt template based on analysis type."""
-        template = config.RESUME_PROMPTS.get(prompt_type, config.RESUME_PROMPTS["general"])
-        return PromptTemplate(
-            template=template,
-            input_variables=["context", "question"]
-        )
+        self.llm = _get_llm(config.OLLAMA_BASE_URL, config.DEFAULT_MODEL)
     
-    def setup_qa_chain(self, prompt_type: str = "general"):
-        """Setup the QA chain with retriever."""
-        retriever = self.vector_store.get_retriever(k=5)
-        if not retriever:
-            return None
+    def answer_question(self, question: str, resumes_fingerprint: int):
+        """Render an answer to the question, streaming it unless already cached."""
+        prompt_type = st.session_state.current_prompt_type
+        cache_key = (question, prompt_type, resumes_fingerprint)
         
-        prompt_template = self.get_prompt_template(prompt_type)
+        answer = _lookup_answer(cache_key)
+        if answer:
+            st.markdown(answer["result"])
+        else:
+            # Only search this session's resumes, so the answer cache key describes the
+            # search space; questions about a single resume only search that resume.
+            # Filter on content hash, since stored chunks keep the name they were first uploaded under
+            filename = _match_resume(question, st.session_state.resumes_processed)
+            if filename:
+                file_shas = (st.session_state.resume_shas[filename],)
+            else:
+                file_shas = tuple(sorted(set(st.session_state.resume_shas.values())))
+            retriever = _get_retriever(self.vector_store, 5, file_shas)
+            if not retriever:
+                return None
+            
+            with st.spinner("🤔 Analyzing resumes..."):
+                source_documents = retriever.invoke(question)
+            
+            response = st.write_stream(
+                _stream_answer(self.llm, source_documents, question, prompt_type)
+            )
+            # Store source refs rather than Documents to keep session state small,
+            # naming each source as it was uploaded in this session
+            names_by_sha = {sha: name for name, sha in st.session_state.resume_shas.items()}
+            answer = {
+                "result": response,
+                "sources": [
+                    {
+                        "filename": names_by_sha.get(
+                            s.metadata.get('file_sha'), s.metadata.get('filename', 'Unknown')
+                        ),
+                        "snippet": s.page_content[:400],
+                    }
+                    for s in source_documents
+                ],
+            }
+            _store_answer(cache_key, answer)
         
-        qa_chain = RetrievalQA.from_chain_type(
-            llm=self.llm,
-            chain_type="stuff",
-            retriever=retriever,
-            chain_type_kwargs={"prompt": prompt_template},
-            return_source_documents=True
-        )
+        if answer["sources"]:
+            _render_sources(answer["sources"])
         
-        return qa_chain
+        return answer
     
     def process_uploaded_files(self, uploaded_files):
         """Process uploaded files and add to vector store."""
         if not uploaded_files:
             return False
         
-        temp_files = []
-        processed_names = []
+        # Parse straight from the upload buffers, without staging them on disk.
+        # Identical files are only parsed and embedded once, whatever their names.
+        file_shas = {}
+        unique_files = {}
+        for uploaded_file in uploaded_files:
+            data = uploaded_file.getbuffer()
+            file_sha = hashlib.sha256(data).hexdigest()
+            file_shas[uploaded_file.name] = file_sha
+            unique_files.setdefault(file_sha, (uploaded_file.name, data))
+        files = [(name, data, file_sha) for file_sha, (name, data) in unique_files.items()]
         
-        try:
-            # Save uploaded files to temporary directory
-            for uploaded_file in uploaded_files:
-                with tempfile.NamedTemporaryFile(delete=False, suffix=f".{uploaded_file.name.split('.')[-1]}") as tmp_file:
-                    tmp_file.write(uploaded_file.getbuffer())
-                    temp_files.append(tmp_file.name)
-                    processed_names.append(uploaded_file.name)
-            
+        with st.status("Processing resumes...", expanded=True) as status:
             # Process documents
-            documents = self.document_processor.process_documents(temp_files)
-            if documents:
-                success = self.vector_store.add_documents(documents)
-                if success:
-                    st.session_state.resumes_processed.extend(processed_names)
-                return success
-            return False
-        
-        finally:
-            # Clean up temporary files
-            for temp_file in temp_files:
-                try:
-                    os.unlink(temp_file)
-                except Exception:
-                    pass
+            status.update(label=f"Parsing {len(files)} files...")
+            documents = self.document_processor.process_documents(files)
+            if not documents:
+                status.update(label="No content could be extracted", state="error")
+                return False
+            
+            progress_bar = st.progress(0.0)
+            
+            def _on_progress(done, total, filename):
+                status.update(label=f"Embedding {filename} ({done}/{total} chunks)")
+                progress_bar.progress(done / total)
+            
+            # Batches are embedded in parallel inside add_documents; progress is reported per batch
+            success = self.vector_store.add_documents(documents, on_progress=_on_progress)
+            if success:
+                st.session_state.resumes_processed.extend(
+                    name for name in file_shas if name not in st.session_state.resume_shas
+                )
+                st.session_state.resume_shas.update(file_shas)
+                status.update(label=f"Processed {len(files)} resumes", state="complete", expanded=False)
+            else:
+                status.update(label="Failed to process resumes", state="error")
+            return success
     
     def run(self):
         st.title("📄 Resume Analysis Assistant")
         st.markdown("**AI-powered resume analysis with local processing and privacy**")
         
         # Check Ollama connection
-        try:
-            self.llm.invoke("test")
+        if _check_ollama(config.OLLAMA_BASE_URL, config.DEFAULT_MODEL):
             connection_status = "🟢 Connected"
-        except Exception as e:
+        else:
             connection_status = "🔴 Disconnected"
-            st.error(f"Cannot connect to Ollama: {str(e)}")
-            st.info("Make sure Ollama is running: `ollama serve` and model is available: `ollama pull gemma:2b`")
+            st.error(f"Cannot connect to Ollama at {config.OLLAMA_BASE_URL}")
+            st.info("Make sure Ollama is running: `ollama serve` and models are available: `ollama pull gemma:2b` and `ollama pull nomic-embed-text`")
         
         # Sidebar for resume management
         with st.sidebar:
-            st.header("📁 Resume Management")
-            st.write(f"Status: {connection_status}")
-            st.write(f"Model: {config.DEFAULT_MODEL}")
-            st.write(f"Resumes loaded: {len(st.session_state.resumes_processed)}")
-            
-            if st.session_state.resumes_processed:
-                with st.expander("📋 Loaded Resumes"):
-                    for resume in st.session_state.resumes_processed:
-                        st.write(f"• {resume}")
-            
-            st.divider()
-            
-            # File upload
-            uploaded_files = st.file_uploader(
-                "Upload Resume Files",
-                type=['pdf', 'txt', 'docx'],
-                accept_multiple_files=True,
-                help="Upload PDF, TXT, or DOCX resume files"
-            )
-            
-            if uploaded_files:
-                if st.button("📤 Process Resumes", type="primary"):
-                    with st.spinner("Processing resumes..."):
-                        if self.process_uploaded_files(uploaded_files):
-                            st.success(f"✅ Processed {len(uploaded_files)} resumes!")
-                            st.rerun()
-                        else:
-                            st.error("❌ Failed to process resumes")
-            
-            st.divider()
-            
-            # Analysis type selection
-            st.header("🔍 Analysis Focus")
-            prompt_type = st.selectbox(
-                "Choose Analysis Type",
-                options=["general", "technical", "experience", "match"],
-                format_func=lambda x: {
-                    "general": "🔍 General Analysis",
-                    "technical": "💻 Technical Skills",
-                    "experience": "💼 Work Experience", 
-                    "match": "🎯 Role Matching"
-                }[x],
-                help="Select the type of analysis to perform"
-            )
+            self._sidebar(connection_status)
+        
+        # Main interface
+        self._chat()
+    
+    @st.fragment
+    def _sidebar(self, connection_status: str):
+        """Resume management sidebar; reruns on its own for local interactions."""
+        st.header("📁 Resume Management")
+        st.write(f"Status: {connection_status}")
+        st.write(f"Model: {config.DEFAULT_MODEL}")
+        st.write(f"Embeddings: {config.EMBEDDING_MODEL}")
+        st.write(f"Resumes loaded: {len(st.session_state.resumes_processed)}")
+        
+        if st.session_state.resumes_processed:
+            with st.expander("📋 Loaded Resumes"):
+                for resume in st.session_state.resumes_processed:
+                    st.write(f"• {resume}")
+        
+        st.divider()
+        
+        # File upload
+        uploaded_files = st.file_uploader(
+            "Upload Resume Files",
+            type=['pdf', 'txt', 'docx'],
+            accept_multiple_files=True,
+            help="Upload PDF, TXT, or DOCX resume files"
+        )
+        
+        if uploaded_files:
+            if st.button("📤 Process Resumes", type="primary"):
+                if self.process_uploaded_files(uploaded_files):
+                    st.success(f"✅ Processed {len(uploaded_files)} resumes!")
+                    st.rerun()
+                else:
+                    st.error("❌ Failed to process resumes")
+        
+        st.divider()
+        
+        # Analysis type selection
+        st.header("🔍 Analysis Focus")
+        prompt_type = st.selectbox(
+            "Choose Analysis Type",
+            options=["general", "technical", "experience", "match"],
+            format_func=lambda x: {
+                "general": "🔍 General Analysis",
+                "technical": "💻 Technical Skills",
+                "experience": "💼 Work Experience", 
+                "match": "🎯 Role Matching"
+            }[x],
+            help="Select the type of analysis to perform"
+        )
+        if prompt_type != st.session_state.current_prompt_type:
             st.session_state.current_prompt_type = prompt_type
-            
-            st.divider()
-            
-            # Quick analysis buttons
-            st.header("⚡ Quick Analysis")
-            for question_type, question in config.QUICK_QUESTIONS.items():
-                if st.button(f"📊 {question_type}", key=f"quick_{question_type}"):
-                    if st.session_state.resumes_processed:
-                        st.session_state.messages.append({"role": "user", "content": question})
-                        # Trigger analysis
-                        st.session_state.pending_question = question
-                        st.rerun()
-                    else:
-                        st.warning("Please upload resumes first!")
-            
-            st.divider()
-            
-            # Database management
-            st.header("🗄️ Database")
-            if st.button("🗑️ Clear All", type="secondary"):
-                if self.vector_store.clear_database():
-                    st.session_state.resumes_processed = []
-                    st.session_state.messages = []
-                    st.success("✅ Database cleared!")
+            # The chat shows the current mode, so refresh the whole page
+            st.rerun()
+        
+        st.divider()
+        
+        # Quick analysis buttons
+        st.header("⚡ Quick Analysis")
+        for question_type, question in config.QUICK_QUESTIONS.items():
+            if st.button(f"📊 {question_type}", key=f"quick_{question_type}"):
+                if st.session_state.resumes_processed:
+                    st.session_state.messages.append({"role": "user", "content": question})
+                    # Trigger analysis
+                    st.session_state.pending_question = question
                     st.rerun()
+                else:
+                    st.warning("Please upload resumes first!")
         
-        # Main interface
+        st.divider()
+        
+        # Database management
+        st.header("🗄️ Database")
+        if st.button("🗑️ Clear All", type="secondary"):
+            if self.vector_store.clear_database():
+                # Cached retrievers are bound to the deleted collection
+                _get_retriever.clear()
+                _get_answer_cache.clear()
+                st.session_state.resumes_processed = []
+                st.session_state.resume_shas = {}
+                st.session_state.messages = []
+                st.success("✅ Database cleared!")
+                st.rerun()
+    
+    @st.fragment
+    def _chat(self):
+        """Main chat area; reruns on its own when a question is asked."""
         if not st.session_state.resumes_processed:
             st.info("👆 Please upload resume files to start your analysis!")
             
@@ -216,16 +350,16 @@ class ResumeAnalyzer:
             }
             st.info(f"Current mode: {mode_display[st.session_state.current_prompt_type]}")
             
+            # Cached answers are only valid for the current resume contents; names are
+            # included because answers label their sources with them
+            resumes_fingerprint = hash(tuple(sorted(st.session_state.resume_shas.items())))
+            
             # Display chat messages
             for message in st.session_state.messages:
                 with st.chat_message(message["role"]):
                     st.markdown(message["content"])
                     if "sources" in message and message["sources"]:
-                        with st.expander("📄 Resume Sources"):
-                            for i, source in enumerate(message["sources"]):
-                                filename = source.metadata.get('filename', 'Unknown')
-                                st.markdown(f"**📄 {filename}**")
-                                st.markdown(f"```\n{source.page_content[:400]}...\n```")
+                        _render_sources(message["sources"])
             
             # Handle pending questions from quick analysis
             if hasattr(st.session_state, 'pending_question'):
@@ -234,27 +368,12 @@ class ResumeAnalyzer:
                 
                 with st.chat_message("assistant"):
                     try:
-                        qa_chain = self.setup_qa_chain(st.session_state.current_prompt_type)
-                        if qa_chain:
-                            with st.spinner("🤔 Analyzing resumes..."):
-                                result = qa_chain({"query": question})
-                            
-                            response = result["result"]
-                            sources = result.get("source_documents", [])
-                            
-                            st.markdown(response)
-                            
-                            if sources:
-                                with st.expander("📄 Resume Sources"):
-                                    for i, source in enumerate(sources):
-                                        filename = source.metadata.get('filename', 'Unknown')
-                                        st.markdown(f"**📄 {filename}**")
-                                        st.markdown(f"```\n{source.page_content[:400]}...\n```")
-                            
+                        result = self.answer_question(question, resumes_fingerprint)
+                        if result:
                             st.session_state.messages.append({
                                 "role": "assistant", 
-                                "content": response,
-                                "sources": sources
+                                "content": result["result"],
+                                "sources": result["sources"]
                             })
                         else:
                             st.error("Unable to setup analysis chain.")
@@ -276,31 +395,16 @@ class ResumeAnalyzer:
                 # Generate response
                 with st.chat_message("assistant"):
                     try:
-                        qa_chain = self.setup_qa_chain(st.session_state.current_prompt_type)
-                        if not qa_chain:
+                        result = self.answer_question(prompt, resumes_fingerprint)
+                        if not result:
                             st.error("Unable to setup analysis chain. Please check your resumes.")
                             return
                         
-                        with st.spinner("🤔 Analyzing resumes..."):
-                            result = qa_chain({"query": prompt})
-                        
-                        response = result["result"]
-                        sources = result.get("source_documents", [])
-                        
-                        st.markdown(response)
-                        
-                        if sources:
-                            with st.expander("📄 Resume Sources"):
-                                for i, source in enumerate(sources):
-                                    filename = source.metadata.get('filename', 'Unknown')
-                                    st.markdown(f"**📄 {filename}**")
-                                    st.markdown(f"```\n{source.page_content[:400]}...\n```")
-                        
                         # Add assistant message
                         st.session_state.messages.append({
                             "role": "assistant", 
-                            "content": response,
-                            "sources": sources
+                            "content": result["result"],
+                            "sources": result["sources"]
                         })
                     
                     except Exception as e:
@@ -319,15 +423,13 @@ def main():
     )
     
     # Check if Ollama is running
-    try:
-        test_llm = OllamaLLM(base_url=config.OLLAMA_BASE_URL, model=config.DEFAULT_MODEL)
-        test_llm.invoke("test")
-    except Exception:
+    if not (_check_ollama(config.OLLAMA_BASE_URL, config.DEFAULT_MODEL)
+            and _check_ollama(config.OLLAMA_BASE_URL, config.EMBEDDING_MODEL)):
         st.error("❌ Ollama is not running or model not found!")
         st.markdown("""
         **Please ensure:**
         1. Ollama is installed and running: `ollama serve`
-        2. The model is pulled: `ollama pull gemma:2b`
+        2. The models are pulled: `ollama pull gemma:2b` and `ollama pull nomic-embed-text`
         3. The model is available: `ollama list`
         """)
         st.stop()    
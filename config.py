@@ -2,14 +2,29 @@ import os
 
 OLLAMA_BASE_URL = "http://localhost:11434"
 DEFAULT_MODEL = "gemma:2b"
+EMBEDDING_MODEL = "nomic-embed-text"  # Dedicated embedding model, much faster than the LLM
 CHROMA_DB_DIR = "./resume_chroma_db"
-COLLECTION_NAME = "resume_collection"
-CHUNK_SIZE = 800  # Smaller chunks for resumes
-CHUNK_OVERLAP = 100
+COLLECTION_NAME = "resume_collection_v2"  # v2: nomic-embed-text vectors, cosine HNSW
+TOKEN_ENCODING = "cl100k_base"
+CHUNK_SIZE = 256  # Tokens; smaller chunks for resumes
+CHUNK_OVERLAP = 32
+CHARS_PER_TOKEN = 4  # Used to size chunks when the token encoding can't be loaded
+
+# HNSW index settings, applied when the collection is first created
+COLLECTION_METADATA = {
+    "hnsw:space": "cosine",
+    "hnsw:M": 8,  # Small resume corpora don't need a dense graph
+    "hnsw:construction_ef": 100,
+    "hnsw:search_ef": 50,
+}
 
 # Ensure ChromaDB directory exists
 os.makedirs(CHROMA_DB_DIR, exist_ok=True)
 
+# Answer cache, keyed on question, prompt type and loaded resumes
+ANSWER_CACHE_TTL = 3600  # Seconds
+ANSWER_CACHE_MAX_ENTRIES = 256
+
 # Resume-specific prompt templates
 RESUME_PROMPTS = {
     "general": """You are an expert resume analyzer and technical recruiter. 
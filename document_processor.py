@@ -1,56 +1,104 @@
 import streamlit as st
+import multiprocessing
 import os
-from typing import List
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Tuple, Union
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
-from langchain_community.document_loaders import PyPDFLoader, TextLoader, Docx2txtLoader
 
 import config
+from file_parsers import parse_bytes
+
+
+@st.cache_resource
+def _get_loader_pool() -> ProcessPoolExecutor:
+    """One loader pool for the server, so worker start-up is paid once rather than per upload."""
+    # Spawn rather than fork, since forking the threaded Streamlit server is unsafe.
+    # Workers are started on demand and only import the lightweight file_parsers module.
+    return ProcessPoolExecutor(
+        max_workers=os.cpu_count() or 1,
+        mp_context=multiprocessing.get_context("spawn"),
+    )
 
 class DocumentProcessor:
     def __init__(self):
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=config.CHUNK_SIZE,
-            chunk_overlap=config.CHUNK_OVERLAP,
-            length_function=len,
-        )
+        # Built on first upload; loading the encoding may need a download
+        self._text_splitter = None
     
-    def load_document(self, file_path: str) -> List[Document]:
-        """Load a single document based on its extension."""
-        file_extension = os.path.splitext(file_path)[1].lower()
-        
+    def get_text_splitter(self) -> Tuple[RecursiveCharacterTextSplitter, str]:
+        """Return the splitter and a tag identifying it, falling back to characters if needed."""
+        if self._text_splitter is None:
+            try:
+                self._text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+                    encoding_name=config.TOKEN_ENCODING,
+                    chunk_size=config.CHUNK_SIZE,
+                    chunk_overlap=config.CHUNK_OVERLAP,
+                )
+            except Exception as e:
+                st.warning(f"Token encoding unavailable, splitting by characters: {e}")
+                chunk_size = config.CHUNK_SIZE * config.CHARS_PER_TOKEN
+                chunk_overlap = config.CHUNK_OVERLAP * config.CHARS_PER_TOKEN
+                # Not cached, so the token splitter is retried on the next upload
+                splitter = RecursiveCharacterTextSplitter(
+                    chunk_size=chunk_size,
+                    chunk_overlap=chunk_overlap,
+                    length_function=len,
+                )
+                return splitter, f"chars-{chunk_size}-{chunk_overlap}"
+        return self._text_splitter, f"{config.TOKEN_ENCODING}-{config.CHUNK_SIZE}-{config.CHUNK_OVERLAP}"
+    
+    def load_bytes(self, name: str, data: Union[bytes, memoryview], ext: str, file_sha: str) -> List[Document]:
+        """Load a single in-memory document based on its extension."""
         try:
-            if file_extension == '.pdf':
-                loader = PyPDFLoader(file_path)
-            elif file_extension in ['.txt', '.md']:
-                loader = TextLoader(file_path, encoding='utf-8')
-            elif file_extension == '.docx':
-                loader = Docx2txtLoader(file_path)
-            else:
-                raise ValueError(f"Unsupported file type: {file_extension}")
-            
-            documents = loader.load()
-            # Add filename to metadata
-            for doc in documents:
-                doc.metadata['filename'] = os.path.basename(file_path)
-            return documents
-        
+            return [
+                Document(page_content=text, metadata=metadata)
+                for text, metadata in parse_bytes(name, data, ext, file_sha)
+            ]
         except Exception as e:
-            st.error(f"Error loading {file_path}: {str(e)}")
+            st.error(f"Error loading {name}: {str(e)}")
             return []
     
-    def process_documents(self, file_paths: List[str]) -> List[Document]:
-        """Process multiple documents and return chunks."""
+    def process_documents(self, files: List[Tuple[str, Union[bytes, memoryview], str]]) -> List[Document]:
+        """Process multiple (filename, content, file_sha) tuples and return chunks."""
         all_documents = []
         
-        for file_path in file_paths:
-            docs = self.load_document(file_path)
-            all_documents.extend(docs)
+        if len(files) == 1:
+            name, data, file_sha = files[0]
+            all_documents.extend(
+                self.load_bytes(name, data, os.path.splitext(name)[1].lower(), file_sha)
+            )
+        else:
+            # Parse files in separate processes; pypdf is pure Python and GIL-bound
+            executor = _get_loader_pool()
+            futures = {
+                # Upload buffers are memoryviews, which must be copied to bytes to pickle
+                executor.submit(
+                    parse_bytes, name, bytes(data), os.path.splitext(name)[1].lower(), file_sha
+                ): name
+                for name, data, file_sha in files
+            }
+            for future in as_completed(futures):
+                try:
+                    all_documents.extend(
+                        Document(page_content=text, metadata=metadata)
+                        for text, metadata in future.result()
+                    )
+                except BrokenProcessPool as e:
+                    # A dead worker breaks the whole pool; start a fresh one next time
+                    _get_loader_pool.clear()
+                    st.error(f"Error loading {futures[future]}: {str(e)}")
+                except Exception as e:
+                    st.error(f"Error loading {futures[future]}: {str(e)}")
         
         if not all_documents:
             return []
         
-        # Split documents into chunks
-        chunks = self.text_splitter.split_documents(all_documents)
+        # Split documents into chunks, tagging how they were split so chunk IDs
+        # from different splitters never collide
+        text_splitter, splitter_tag = self.get_text_splitter()
+        chunks = text_splitter.split_documents(all_documents)
+        for chunk in chunks:
+            chunk.metadata['splitter'] = splitter_tag
         
         return chunks
@@ -0,0 +1,27 @@
+import io
+from typing import Dict, List, Tuple, Union
+
+import docx2txt
+from pypdf import PdfReader
+
+# Kept free of streamlit/langchain imports so loader worker processes start quickly
+
+
+def parse_bytes(
+    name: str, data: Union[bytes, memoryview], ext: str, file_sha: str
+) -> List[Tuple[str, Dict]]:
+    """Parse an in-memory document into (text, metadata) pairs, raising on failure."""
+    if ext == '.pdf':
+        reader = PdfReader(io.BytesIO(data))
+        return [
+            (page.extract_text() or "", {'filename': name, 'file_sha': file_sha, 'page': i})
+            for i, page in enumerate(reader.pages)
+        ]
+    elif ext in ['.txt', '.md']:
+        text = str(data, 'utf-8')
+    elif ext == '.docx':
+        text = docx2txt.process(io.BytesIO(data))
+    else:
+        raise ValueError(f"Unsupported file type: {ext}")
+
+    return [(text, {'filename': name, 'file_sha': file_sha})]
@@ -1,16 +1,32 @@
 import streamlit as st
-from typing import List
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+from uuid import uuid4
 from langchain.schema import Document
 from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import OllamaEmbeddings
+from langchain_ollama import OllamaEmbeddings
 import chromadb
+import httpx
 from chromadb.config import Settings
 
 import config
 
+@st.cache_resource
+def _get_embeddings(base_url: str, model: str) -> OllamaEmbeddings:
+    """Create the embeddings client once per (base_url, model)."""
+    # One pooled keep-alive HTTP client, shared by every embedding thread and session
+    return OllamaEmbeddings(
+        base_url=base_url,
+        model=model,
+        client_kwargs={
+            "limits": httpx.Limits(max_keepalive_connections=16, max_connections=32),
+        },
+    )
+
 class VectorStore:
-    def __init__(self, model_name: str = config.DEFAULT_MODEL):
-        self.embeddings = OllamaEmbeddings(base_url=config.OLLAMA_BASE_URL, model=model_name)
+    def __init__(self, model_name: str = config.EMBEDDING_MODEL):
+        self.embeddings = _get_embeddings(config.OLLAMA_BASE_URL, model_name)
 
         # Initialize ChromaDB client
         self.client = chromadb.PersistentClient(
@@ -19,6 +35,7 @@ class VectorStore:
         )
 
         self.vector_store = None
+        self.collection = None
         self._initialize_vector_store()
 
     def _initialize_vector_store(self):
@@ -28,28 +45,95 @@ class VectorStore:
                 client=self.client,
                 collection_name=config.COLLECTION_NAME,
                 embedding_function=self.embeddings,
+                collection_metadata=config.COLLECTION_METADATA,
             )
+            # Native handle for writes; the LangChain wrapper is only used for retrieval
+            self.collection = self.client.get_collection(config.COLLECTION_NAME)
         except Exception as e:
             st.error(f"Error initializing vector store: {e}")
 
-    def add_documents(self, documents: List[Document]) -> bool:
-        """Add documents to the vector store."""
+    def add_documents(
+        self,
+        documents: List[Document],
+        on_progress: Optional[Callable[[int, int, str], None]] = None,
+    ) -> bool:
+        """Add documents to the vector store, reporting (done, total, filename) progress."""
         if not documents:
             return False
 
         try:
-            self.vector_store.add_documents(documents)
+            # Content-addressed IDs let us skip chunks that are already embedded
+            new_docs = {}
+            chunk_counts = {}
+            splitters = {}
+            for doc in documents:
+                file_sha = doc.metadata.get("file_sha")
+                if file_sha:
+                    chunk_idx = chunk_counts.get(file_sha, 0)
+                    chunk_counts[file_sha] = chunk_idx + 1
+                    splitter = doc.metadata.get("splitter", "")
+                    splitters[file_sha] = splitter
+                    chunk_id = f"{file_sha}:{splitter}:{chunk_idx}"
+                else:
+                    chunk_id = hashlib.blake2b(doc.page_content.encode(), digest_size=16).hexdigest()
+                new_docs.setdefault(chunk_id, doc)
+
+            # Drop chunks of these files stored under a different split, so they aren't mixed
+            for file_sha, splitter in splitters.items():
+                self.collection.delete(
+                    where={"$and": [{"file_sha": file_sha}, {"splitter": {"$ne": splitter}}]}
+                )
+
+            existing = self.collection.get(ids=list(new_docs), include=[])
+            for chunk_id in existing["ids"]:
+                del new_docs[chunk_id]
+
+            if new_docs:
+                self.add_documents_batched(
+                    list(new_docs.values()), ids=list(new_docs), on_progress=on_progress
+                )
             return True
         except Exception as e:
             st.error(f"Error adding documents: {e}")
             return False
 
-    def get_retriever(self, k: int = 5):  # More context for resumes
-        """Get retriever for RAG chain."""
+    def add_documents_batched(
+        self,
+        documents: List[Document],
+        batch_size: int = 64,
+        max_workers: int = 8,
+        ids: Optional[List[str]] = None,
+        on_progress: Optional[Callable[[int, int, str], None]] = None,
+    ):
+        """Embed documents in parallel batches and write them straight to Chroma."""
+        texts = [doc.page_content for doc in documents]
+        metadatas = [doc.metadata for doc in documents]
+        if ids is None:
+            ids = [uuid4().hex for _ in documents]
+
+        batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+        vectors = []
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # map() preserves batch order, so vectors line up with texts/ids
+            for batch_vectors in executor.map(self.embeddings.embed_documents, batches):
+                vectors.extend(batch_vectors)
+                if on_progress:
+                    done = len(vectors)
+                    on_progress(done, len(texts), metadatas[done - 1].get("filename", ""))
+
+        self.collection.add(
+            ids=ids, embeddings=vectors, documents=texts, metadatas=metadatas
+        )
+
+    def get_retriever(self, k: int = 5, filter_metadata: Optional[Dict] = None):  # More context for resumes
+        """Get retriever for RAG chain, optionally restricted by a metadata filter."""
         if not self.vector_store:
             return None
+        search_kwargs = {"k": k}
+        if filter_metadata:
+            search_kwargs["filter"] = filter_metadata
         return self.vector_store.as_retriever(
-            search_type="similarity", search_kwargs={"k": k}
+            search_type="similarity", search_kwargs=search_kwargs
         )
 
     def clear_database(self):